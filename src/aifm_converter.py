@@ -5,22 +5,27 @@ AIFM Converter (AIFX Converter v0.1 - aligned)
 - Preserves payload bytes unchanged (copied into container)
 - Generates metadata/manifest.json
 - Generates verification/checksums.sha256 for ALL files under payload/ only (v0.1 rule)
+  (verification/checksums.blake3 with --hash-alg blake3)
 - Adds optional public attestation URLs (--url repeatable)
 """
 
 from __future__ import annotations
 
 import argparse
-import datetime as dt
 import hashlib
-import json
 import os
 import posixpath
+import shutil
 import sys
+import time
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# json/orjson, blake3 and the thread pool are imported where first used
+# (once per conversion / batch) so --help and argument errors skip them;
+# zipfile, hashlib and shutil are needed for every entry and stay here.
 
 
 AIFX_SPEC_VERSION = "0.1"
@@ -30,17 +35,56 @@ AIFX_FORMAT_VERSION = "1.0"  # stable container/manifest format version
 DEFAULT_TIER = "SDA"
 DEFAULT_MODE = "human-directed-ai"
 
+# --hash-alg value -> (manifest integrity.hash_alg, checksums file name)
+HASH_ALGS: Dict[str, Tuple[str, str]] = {
+    "sha256": ("SHA-256", "checksums.sha256"),
+    "blake3": ("BLAKE3", "checksums.blake3"),
+}
+DEFAULT_HASH_ALG = "sha256"
+
+# Read size for streaming payload files (hashing / copying)
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Already entropy-coded audio: DEFLATE gains ~0% on these, so they are STORED
+INCOMPRESSIBLE_EXTS = frozenset({"mp3", "flac", "ogg", "m4a", "aac", "opus"})
+
+# Fast DEFLATE for everything else (WAV stems, text metadata)
+DEFLATE_LEVEL = 1
+
+# Entries smaller than this are STORED: zlib setup costs more than it saves
+SMALL_ENTRY_SIZE = 4096
+
 
 def utc_now_iso() -> str:
-    return dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    # Same "YYYY-MM-DDTHH:MM:SSZ" as the datetime isoformat path, formatted in C
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
-def sha256_file(path: Path) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
+def dump_json(obj: Dict) -> bytes:
+    try:
+        # Optional: Rust JSON encoder, same output as json.dumps(indent=2)
+        import orjson
+    except ImportError:
+        import json
+
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+
+def hasher_factory(hash_alg: str) -> Callable[[], Any]:
+    """
+    Returns a zero-argument constructor for the --hash-alg hasher. Resolved
+    once per conversion; the optional blake3 package is probed here.
+    """
+    if hash_alg == "blake3":
+        try:
+            # Optional: SIMD + multithreaded hashing
+            from blake3 import blake3
+        except ImportError:
+            raise RuntimeError("--hash-alg blake3 requires the blake3 package (pip install blake3)") from None
+        # AUTO spreads each large update() across cores
+        return lambda: blake3(max_threads=blake3.AUTO)
+    return hashlib.sha256
 
 
 def normalize_zip_path(*parts: str) -> str:
@@ -48,10 +92,23 @@ def normalize_zip_path(*parts: str) -> str:
     return posixpath.normpath(posixpath.join(*parts)).lstrip("/")
 
 
-def iter_files_recursive(root: Path) -> Iterable[Path]:
-    for p in sorted(root.rglob("*")):
-        if p.is_file():
-            yield p
+def iter_files_recursive(root: Path, zip_prefix: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (zip_path, local_path) for every file under root, in no particular
+    order; callers sort once by zip_path. Like rglob, symlinked dirs are not
+    descended into. local_path is the raw os.scandir path string (no Path
+    object per stem).
+    """
+    stack: List[Tuple[str, str]] = [(str(root), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                rel = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel + "/"))
+                elif entry.is_file():
+                    yield normalize_zip_path(zip_prefix, rel), entry.path
 
 
 @dataclass
@@ -75,9 +132,10 @@ class ConvertOptions:
     persona_path: Optional[Path]
     declaration_path: Optional[Path]
     urls: List[str]
+    hash_alg: str = DEFAULT_HASH_ALG
 
 
-def build_manifest(opts: ConvertOptions) -> Dict:
+def build_manifest(opts: ConvertOptions, created_at: Optional[str] = None) -> Dict:
     """
     v0.1 minimum manifest aligned with your draft, updated:
     - uses aifx_format_version + aifx_spec_version
@@ -85,11 +143,12 @@ def build_manifest(opts: ConvertOptions) -> Dict:
     - references persona/declaration if present
     - includes optional public_attestation.urls
     """
+    hash_alg_name, checksums_name = HASH_ALGS[opts.hash_alg]
     manifest: Dict = {
         "aifx_format_version": AIFX_FORMAT_VERSION,
         "aifx_spec_version": AIFX_SPEC_VERSION,
         "format": "AIFM",
-        "created_at": utc_now_iso(),
+        "created_at": created_at or utc_now_iso(),
         "title": opts.title or "Untitled",
         "description": opts.description or "",
         "creation_mode": opts.creation_mode,
@@ -121,8 +180,8 @@ def build_manifest(opts: ConvertOptions) -> Dict:
         },
 
         "integrity": {
-            "hash_alg": "SHA-256",
-            "checksums_ref": "verification/checksums.sha256",
+            "hash_alg": hash_alg_name,
+            "checksums_ref": normalize_zip_path("verification", checksums_name),
         },
     }
 
@@ -160,39 +219,78 @@ def build_manifest(opts: ConvertOptions) -> Dict:
     return manifest
 
 
-def zip_write_bytes(zf: zipfile.ZipFile, arcname: str, data: bytes) -> None:
+def make_zip_info(arcname: str, file_size: int) -> zipfile.ZipInfo:
     info = zipfile.ZipInfo(arcname)
     # Deterministic timestamps for stable archives
     info.date_time = (1980, 1, 1, 0, 0, 0)
-    info.compress_type = zipfile.ZIP_DEFLATED
-    zf.writestr(info, data)
+    # Known size up front lets zipfile pick ZIP64 headers for >4 GiB stems
+    info.file_size = file_size
+    # Compression does not alter extracted bytes; payload remains unchanged.
+    if file_size < SMALL_ENTRY_SIZE:
+        info.compress_type = zipfile.ZIP_STORED
+    elif posixpath.splitext(arcname)[1].lower().lstrip(".") in INCOMPRESSIBLE_EXTS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+        # Every entry is written via zf.open(info, "w"), which ignores
+        # ZipFile(compresslevel=...) and reads the level from the ZipInfo.
+        # The only settable spot before 3.13 is the private _compresslevel;
+        # on 3.13+ it is a compat alias for the public compress_level.
+        info._compresslevel = DEFLATE_LEVEL
+    return info
+
+
+def zip_write_bytes(zf: zipfile.ZipFile, arcname: str, data: bytes) -> None:
+    info = make_zip_info(arcname, len(data))
+    with zf.open(info, "w") as dst:
+        dst.write(data)
 
 
 def zip_write_file(zf: zipfile.ZipFile, arcname: str, src_path: Path) -> None:
-    # Compression does not alter extracted bytes; payload remains unchanged.
-    info = zipfile.ZipInfo(arcname)
-    info.date_time = (1980, 1, 1, 0, 0, 0)
-    info.compress_type = zipfile.ZIP_DEFLATED
-    with src_path.open("rb") as f:
-        zf.writestr(info, f.read())
+    with src_path.open("rb") as src:
+        # fstat on the open handle: no second path lookup per file
+        info = make_zip_info(arcname, os.fstat(src.fileno()).st_size)
+        # Bounded memory regardless of file size
+        with zf.open(info, "w") as dst:
+            shutil.copyfileobj(src, dst, HASH_CHUNK_SIZE)
+
 
+def zip_write_payload_file(zf: zipfile.ZipFile, arcname: str, src_path: Union[str, Path],
+                           new_hasher: Callable[[], Any] = hashlib.sha256) -> str:
+    """
+    Streams src_path into the archive, hashing each chunk on the way through
+    so payload files are only read from disk once.
+    Returns the hex digest (per new_hasher) of the (unchanged) payload bytes.
+    """
+    h = new_hasher()
+    with open(src_path, "rb") as src:
+        # fstat on the open handle: no second path lookup per stem
+        info = make_zip_info(arcname, os.fstat(src.fileno()).st_size)
+        with zf.open(info, "w") as dst:
+            # Read to EOF, not to st_size: procfs files and files still being
+            # written can hold more than fstat reported. STORED audio goes
+            # through here too rather than os.sendfile(): the bytes must reach
+            # userspace for hashing anyway, and writing the chunk already in
+            # hand beats a second kernel copy
+            for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+                dst.write(chunk)
+    return h.hexdigest()
 
-def make_checksums_payload_only(payload_entries: List[Tuple[str, Path]]) -> str:
+
+def make_checksums_payload_only(payload_digests: List[Tuple[str, str]]) -> str:
     """
-    payload_entries: list of (zip_path, local_path) for files under payload/
+    payload_digests: list of (zip_path, hex_digest) for files under payload/
     Output format: "<hex>  <zip_path>\n"
     """
     lines: List[str] = []
-    for zip_path, local_path in sorted(payload_entries, key=lambda x: x[0]):
-        digest = sha256_file(local_path)
+    for zip_path, digest in sorted(payload_digests, key=lambda x: x[0]):
         lines.append(f"{digest}  {zip_path}")
     return "\n".join(lines) + "\n"
 
 
-def build_readme(manifest: Dict) -> str:
-    tier = manifest.get("verification", {}).get("tier", "SDA")
-    title = manifest.get("title", "Untitled")
-    created_at = manifest.get("created_at", "")
+def build_readme(title: str, created_at: str, tier: str,
+                 checksums_ref: str = "verification/checksums.sha256") -> str:
     return (
         "AIFX Container (AIFM)\n"
         "-------------------\n"
@@ -201,7 +299,7 @@ def build_readme(manifest: Dict) -> str:
         f"Verification Tier: {tier}\n\n"
         "This container is a ZIP-based AIFX format.\n"
         "Authoritative metadata is in: metadata/manifest.json\n"
-        "Integrity hashes are in: verification/checksums.sha256\n"
+        f"Integrity hashes are in: {checksums_ref}\n"
         "This README is non-authoritative.\n"
     )
 
@@ -229,39 +327,39 @@ def convert_aifm(opts: ConvertOptions) -> None:
     if opts.lyrics_path and not opts.lyrics_path.exists():
         raise FileNotFoundError(f"Lyrics file not found: {opts.lyrics_path}")
 
+    if opts.hash_alg not in HASH_ALGS:
+        raise ValueError(f"Unsupported hash algorithm: {opts.hash_alg}")
+
+    new_hasher = hasher_factory(opts.hash_alg)
+
     out = opts.out_path
     if out.suffix.lower() != ".aifm":
         out = out.with_suffix(".aifm")
 
-    # Payload entries for checksum generation (payload-only)
-    payload_entries: List[Tuple[str, Path]] = []
-
     # Canonical primary asset path
     audio_ext = audio.suffix.lower().lstrip(".") or "wav"
     audio_zip_path = normalize_zip_path("payload", "audio", f"main.{audio_ext}")
-    payload_entries.append((audio_zip_path, audio))
 
     # Optional stems
-    stems_files: List[Tuple[str, Path]] = []
+    stems_files: List[Tuple[str, str]] = []
     if opts.stems_dir:
-        for f in iter_files_recursive(opts.stems_dir):
-            rel = f.relative_to(opts.stems_dir)
-            zip_path = normalize_zip_path("payload", "stems", str(rel).replace(os.sep, "/"))
-            stems_files.append((zip_path, f))
-        payload_entries.extend(stems_files)
+        stems_files = sorted(iter_files_recursive(opts.stems_dir, "payload/stems"), key=lambda x: x[0])
 
-    manifest = build_manifest(opts)
-    manifest_bytes = json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8")
-    checksums_bytes = make_checksums_payload_only(payload_entries).encode("utf-8")
-    readme_bytes = build_readme(manifest).encode("utf-8")
+    # One timestamp shared by manifest and README
+    created_at = utc_now_iso()
+    manifest = build_manifest(opts, created_at)
+    manifest_bytes = dump_json(manifest)
+    checksums_ref = manifest["integrity"]["checksums_ref"]
+    readme_bytes = build_readme(manifest["title"], created_at, opts.tier, checksums_ref).encode("utf-8")
 
     out.parent.mkdir(parents=True, exist_ok=True)
 
     with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        # payload
-        zip_write_file(zf, audio_zip_path, audio)
-        for zip_path, fpath in sorted(stems_files, key=lambda x: x[0]):
-            zip_write_file(zf, zip_path, fpath)
+        # payload (hashed while streaming; checksums are emitted after)
+        payload_digests: List[Tuple[str, str]] = []
+        payload_digests.append((audio_zip_path, zip_write_payload_file(zf, audio_zip_path, audio, new_hasher)))
+        for zip_path, fpath in stems_files:
+            payload_digests.append((zip_path, zip_write_payload_file(zf, zip_path, fpath, new_hasher)))
 
         # metadata
         zip_write_bytes(zf, normalize_zip_path("metadata", "manifest.json"), manifest_bytes)
@@ -281,7 +379,8 @@ def convert_aifm(opts: ConvertOptions) -> None:
             zip_write_file(zf, normalize_zip_path("metadata", "declaration.txt"), opts.declaration_path)
 
         # verification
-        zip_write_bytes(zf, normalize_zip_path("verification", "checksums.sha256"), checksums_bytes)
+        checksums_bytes = make_checksums_payload_only(payload_digests).encode("utf-8")
+        zip_write_bytes(zf, checksums_ref, checksums_bytes)
 
         # README
         zip_write_bytes(zf, "README.txt", readme_bytes)
@@ -299,7 +398,27 @@ def convert_aifm(opts: ConvertOptions) -> None:
     if opts.urls:
         print(f"   - URL(s): {len(opts.urls)}")
     print("   - Manifest: metadata/manifest.json")
-    print("   - Checksums: verification/checksums.sha256")
+    print(f"   - Checksums: {checksums_ref}")
+
+
+def batch_convert(opts_list: Iterable[ConvertOptions], max_workers: Optional[int] = None) -> List[Optional[Exception]]:
+    """
+    Library entry point for pipelines converting many containers: one
+    interpreter (imports paid once) and one shared thread pool, since hashing
+    and DEFLATE release the GIL. Progress lines of concurrent jobs may interleave.
+    Returns one result per job, in input order: None on success, else the exception.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(opts: ConvertOptions) -> Optional[Exception]:
+        try:
+            convert_aifm(opts)
+            return None
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as ex:
+        return list(ex.map(run, opts_list))
 
 
 def parse_args(argv: Optional[List[str]] = None) -> ConvertOptions:
@@ -339,6 +458,9 @@ def parse_args(argv: Optional[List[str]] = None) -> ConvertOptions:
     p.add_argument("--persona", type=str, default=None, help="Path to persona.txt (optional).")
     p.add_argument("--declaration", type=str, default=None, help="Path to declaration.txt (optional).")
 
+    p.add_argument("--hash-alg", type=str, default=DEFAULT_HASH_ALG, choices=sorted(HASH_ALGS),
+                   help="Payload checksum algorithm (blake3 requires the blake3 package).")
+
     # Optional public URLs (repeatable)
     p.add_argument(
         "--url",
@@ -369,6 +491,7 @@ def parse_args(argv: Optional[List[str]] = None) -> ConvertOptions:
         persona_path=Path(a.persona).expanduser().resolve() if a.persona else None,
         declaration_path=Path(a.declaration).expanduser().resolve() if a.declaration else None,
         urls=a.url or [],
+        hash_alg=a.hash_alg,
     )
 
 
@@ -6,6 +6,7 @@ AIFM Reader / Validator (AIFX v0.1 - aligned)
 - Displays public_attestation.urls if present
 - Optionally displays metadata/persona.txt and metadata/declaration.txt
 - Verifies verification/checksums.sha256 against payload files ONLY
+  (or whichever checksums_ref / hash_alg the manifest's integrity block names)
 - Does NOT interpret persona/declaration (display-only, non-authoritative)
 """
 
@@ -13,15 +14,56 @@ from __future__ import annotations
 
 import argparse
 import hashlib
-import json
+import os
+import posixpath
+import re
 import sys
-import zipfile
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, List, Optional, Tuple
 
+# zipfile, json, blake3 and the thread pool are imported where first used
+# (once per run) so --help and "file not found" skip them.
+if TYPE_CHECKING:
+    import threading
+    import zipfile
 
-def sha256_bytes(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
+
+# Read size for streaming payload entries out of the container
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+# "<hash>  <zip_path>" per line (sha256sum/b3sum text format); the path runs
+# to end of line minus trailing whitespace. Blank/one-field lines are skipped.
+CHECKSUM_LINE_RE = re.compile(r"^[^\S\n]*(\S+)[^\S\n]+(\S.*?)[^\S\n]*$", re.M)
+
+# Every other boundary str.splitlines() honours; folded to "\n" first since
+# re.M's ^/$ only see "\n"
+LINE_SEP_RE = re.compile(r"\r\n|[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# manifest integrity.hash_alg values this reader can verify
+SUPPORTED_HASH_ALGS = ("SHA-256", "BLAKE3")
+
+
+def hash_stream(f: BinaryIO, new_hasher: Callable[[], Any] = hashlib.sha256) -> str:
+    # Python 3.11+: chunked read + update loop runs entirely in C, readinto()
+    # a single preallocated 256 KiB buffer. ZipExtFile has no native readinto
+    # (BufferedIOBase reads a fresh bytes object, then copies), so a larger
+    # caller-owned arena only adds a bigger, cache-unfriendly memcpy.
+    if hasattr(hashlib, "file_digest"):
+        return hashlib.file_digest(f, new_hasher).hexdigest()
+
+    # Pre-3.11: read() hands back the decompressor's output without a copy
+    h = new_hasher()
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def format_json(obj: Dict) -> str:
+    # Stdlib json on purpose: it round-trips anything json.loads accepted
+    # (big ints, NaN/Infinity), so the display matches the file.
+    import json
+
+    return json.dumps(obj, indent=2, ensure_ascii=False)
 
 
 def parse_sha256sum(text: str) -> List[Tuple[str, str]]:
@@ -30,25 +72,13 @@ def parse_sha256sum(text: str) -> List[Tuple[str, str]]:
       <hash>  payload/audio/main.mp3
     Returns list of (expected_hash, zip_path)
     """
-    entries: List[Tuple[str, str]] = []
-
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-
-        if "  " in line:
-            h, p = line.split("  ", 1)
-            entries.append((h.strip(), p.strip()))
-        else:
-            parts = line.split()
-            if len(parts) >= 2:
-                entries.append((parts[0], parts[1]))
-
-    return entries
+    # One C-level scan over the whole file instead of per-line Python work
+    return CHECKSUM_LINE_RE.findall(LINE_SEP_RE.sub("\n", text))
 
 
 def read_manifest(zf: zipfile.ZipFile) -> Dict:
+    import json
+
     data = zf.read("metadata/manifest.json")
     return json.loads(data.decode("utf-8"))
 
@@ -60,23 +90,77 @@ def read_optional_text(zf: zipfile.ZipFile, path: str) -> str:
         return ""
 
 
-def verify_payload_checksums(zf: zipfile.ZipFile) -> List[str]:
+def hash_zip_entry(zf: zipfile.ZipFile, zip_path: str, lock: threading.Lock,
+                   new_hasher: Callable[[], Any] = hashlib.sha256) -> Optional[str]:
+    """
+    Returns the hex digest (per new_hasher) of a zip entry, or None if it is missing.
+    Safe to call from several threads sharing one ZipFile.
+    """
+    # ZipFile.open()/close() bookkeeping is not thread-safe; entry reads are
+    with lock:
+        try:
+            src = zf.open(zip_path)
+        except KeyError:
+            return None
+    try:
+        # Stream the entry so peak memory is one chunk, not the whole file
+        return hash_stream(src, new_hasher)
+    finally:
+        with lock:
+            src.close()
+
+
+def integrity_field_errors(hash_alg: object, checksums_ref: object) -> List[str]:
+    """
+    Validates manifest integrity.hash_alg / integrity.checksums_ref values.
+    Returns list of error strings; empty list means usable.
+    """
+    if not isinstance(hash_alg, str) or hash_alg not in SUPPORTED_HASH_ALGS:
+        return [f"Unsupported integrity hash_alg in manifest: {hash_alg!r}"]
+    if (not isinstance(checksums_ref, str)
+            or not checksums_ref.startswith("verification/")
+            or posixpath.normpath(checksums_ref) != checksums_ref):
+        return [f"Invalid integrity checksums_ref in manifest (expected a file under verification/): {checksums_ref!r}"]
+    return []
+
+
+def verify_payload_checksums(zf: zipfile.ZipFile, hash_alg: str = "SHA-256",
+                             checksums_ref: str = "verification/checksums.sha256") -> List[str]:
     """
-    Verifies payload-only integrity based on verification/checksums.sha256
+    Verifies payload-only integrity based on checksums_ref (hashed with hash_alg)
     Returns list of error strings; empty list means OK.
     """
-    errors: List[str] = []
-    checksum_text = zf.read("verification/checksums.sha256").decode("utf-8", errors="replace")
+    errors = integrity_field_errors(hash_alg, checksums_ref)
+    if errors:
+        return errors
+    if hash_alg == "BLAKE3":
+        try:
+            # Optional: needed only for containers written with --hash-alg blake3
+            from blake3 import blake3
+        except ImportError:
+            return ["BLAKE3 checksums require the blake3 package (pip install blake3)"]
+        # AUTO spreads each large update() across cores
+        new_hasher = lambda: blake3(max_threads=blake3.AUTO)  # noqa: E731
+    else:
+        new_hasher = hashlib.sha256
+
+    checksum_text = zf.read(checksums_ref).decode("utf-8", errors="replace")
     entries = parse_sha256sum(checksum_text)
 
-    for expected_hash, zip_path in entries:
-        try:
-            data = zf.read(zip_path)
-        except KeyError:
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Decompression and hashing release the GIL, so stems hash in parallel.
+    # map() keeps results in checksum-file order for deterministic reports.
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as ex:
+        actual_hashes = list(ex.map(lambda e: hash_zip_entry(zf, e[1], lock, new_hasher), entries))
+
+    for (expected_hash, zip_path), actual_hash in zip(entries, actual_hashes):
+        if actual_hash is None:
             errors.append(f"Missing payload file listed in checksums: {zip_path}")
             continue
 
-        actual_hash = sha256_bytes(data)
         if actual_hash.lower() != expected_hash.lower():
             errors.append(
                 f"Hash mismatch: {zip_path}\n"
@@ -102,30 +186,44 @@ def main(argv=None) -> int:
         print(f"❌ File not found: {path}", file=sys.stderr)
         return 1
 
+    import zipfile
+
     try:
         with zipfile.ZipFile(path, "r") as zf:
             required_files = [
                 "metadata/manifest.json",
-                "verification/checksums.sha256",
                 "README.txt",
             ]
-            names = set(zf.namelist())
+            # zipfile's own name -> ZipInfo dict; no list/set copy needed
+            names = zf.NameToInfo
             for req in required_files:
                 if req not in names:
                     print(f"❌ Missing required file: {req}", file=sys.stderr)
                     return 1
 
             manifest = read_manifest(zf)
+            # Field lookups below tolerate a non-object manifest
+            fields = manifest if isinstance(manifest, dict) else {}
+
+            # Checksum file location and algorithm are declared by the manifest
+            integrity = fields.get("integrity", {})
+            integrity = integrity if isinstance(integrity, dict) else {}
+            hash_alg = integrity.get("hash_alg", "SHA-256")
+            checksums_ref = integrity.get("checksums_ref", "verification/checksums.sha256")
+            # Malformed fields are reported by verify_payload_checksums below
+            if not integrity_field_errors(hash_alg, checksums_ref) and checksums_ref not in names:
+                print(f"❌ Missing required file: {checksums_ref}", file=sys.stderr)
+                return 1
 
             if args.json:
-                print(json.dumps(manifest, indent=2, ensure_ascii=False))
+                print(format_json(manifest))
                 return 0
 
             print("✅ Manifest (authoritative):")
-            print(json.dumps(manifest, indent=2, ensure_ascii=False))
+            print(format_json(manifest))
 
             # Show public URLs if present
-            pa = manifest.get("public_attestation", {}) if isinstance(manifest, dict) else {}
+            pa = fields.get("public_attestation", {})
             urls = pa.get("urls", []) if isinstance(pa, dict) else []
             if urls:
                 print("\n🔗 Public Attestation URLs (manifest):")
@@ -143,8 +241,8 @@ def main(argv=None) -> int:
                 print("\n📜 Declaration (metadata/declaration.txt — non-authoritative):")
                 print(declaration.strip())
 
-            print("\n🔎 Verifying payload integrity (SHA-256)...")
-            errors = verify_payload_checksums(zf)
+            print(f"\n🔎 Verifying payload integrity ({hash_alg})...")
+            errors = verify_payload_checksums(zf, hash_alg, checksums_ref)
             if errors:
                 print("❌ Integrity check FAILED:")
                 for err in errors: